@@ -7,14 +7,49 @@ Odoo Module Code Extractor for AI
 
 import argparse
 import ast
+import codecs
 import hashlib
+import io
 import json
+import multiprocessing
 import os
 import sys
 import xml.etree.ElementTree as ET
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
+from operator import itemgetter
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _read_and_hash(file_item, stream_threshold):
+    """读取单个文件并计算校验和（线程/进程worker共用）"""
+    try:
+        # 大文件只做分块校验和，内容留到写出时流式拷贝
+        if file_item["size"] > stream_threshold:
+            return None, _hash_file_stream(file_item["path"]), None
+
+        raw_bytes = Path(file_item["path"]).read_bytes()
+        checksum = hashlib.blake2b(raw_bytes, digest_size=4).hexdigest()
+        return raw_bytes, checksum, None
+    except Exception as e:
+        return None, "error", e
+
+
+def _hash_file_stream(path):
+    """分块计算文件校验和，避免整读进内存"""
+    digest = hashlib.blake2b(digest_size=4)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 
 class OdooModuleExtractor:
     """Odoo模块代码提取器"""
@@ -47,6 +82,12 @@ class OdooModuleExtractor:
         ".venv",
     }
 
+    # 超过该大小的文件不再整体读入内存，跳过解析并流式写出
+    STREAM_THRESHOLD = 1 << 20  # 1MB
+
+    # 模块小于该文件数时进程池的启动开销得不偿失
+    MIN_FILES_FOR_POOL = 64
+
     # 重要文件优先级
     PRIORITY_FILES = {
         "__manifest__.py": 1,
@@ -61,15 +102,48 @@ class OdooModuleExtractor:
         "reports/*.xml": 10,
     }
 
-    def __init__(self, module_path, output_dir="output"):
+    def __init__(
+        self, module_path, output_dir="output", parse_limit=256 * 1024, jobs=1
+    ):
         self.module_path = Path(module_path)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.parse_limit = parse_limit
+        self.jobs = jobs
+        # 解析上限高于流式阈值时按解析上限整读，保证--parse-limit生效
+        self._stream_threshold = max(self.STREAM_THRESHOLD, parse_limit)
 
         self.module_name = self.module_path.name
         self.module_info = {}
         self.file_index = []
         self.total_size = 0
+        self._type_counter = Counter()
+        self._walk_cache = None
+        self._file_data = {}
+
+        # 统一的开始时间，保证三个输出文件的时间戳一致
+        self._started = datetime.now()
+        self._started_str = self._started.strftime("%Y-%m-%d %H:%M:%S")
+
+        # 预编译排除模式：字面名称用集合，通配符只保留后缀
+        self._exclude_exact = frozenset(
+            p for p in self.EXCLUDE_PATTERNS if not p.startswith("*")
+        )
+        self._exclude_suffixes = tuple(
+            p[1:] for p in self.EXCLUDE_PATTERNS if p.startswith("*")
+        )
+        self._include_ext = frozenset(self.INCLUDE_EXTENSIONS)
+
+        # 预解析优先级模式：顶层文件名和(目录, 扩展名)两张查找表
+        self._priority_exact = {}
+        self._priority_dir_ext = {}
+        for pattern, priority in self.PRIORITY_FILES.items():
+            if "*" in pattern:
+                # 形如 models/*.py -> ("models", ".py")
+                dir_part, filename = pattern.rsplit("/", 1)
+                self._priority_dir_ext[(dir_part, filename[1:])] = priority
+            else:
+                self._priority_exact[pattern] = priority
 
     def extract(self):
         """执行提取流程"""
@@ -109,67 +183,94 @@ class OdooModuleExtractor:
         """生成目录树结构"""
         tree_file = self.output_dir / f"{self.module_name}_structure.txt"
 
+        # 先在内存中拼好所有行，单次写出
+        lines = [
+            f"# {self.module_name} 目录结构\\n",
+            f"# 生成时间: {self._started_str}\\n\\n",
+        ]
+
+        for item in self._collect_entries():
+            level = item["rel_path"].count("/")
+            indent = "  " * level
+
+            if item["type"] == "dir":
+                lines.append(f"{indent}{item['name']}/\\n")
+            else:
+                size_kb = item["size"] / 1024
+                lines.append(f"{indent}{item['name']} ({size_kb:.1f}KB)\\n")
+
         with open(tree_file, "w", encoding="utf-8") as f:
-            f.write(f"# {self.module_name} 目录结构\\n")
-            f.write(f"# 生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\\n\\n")
+            f.write("".join(lines))
+
+    def _walk_directory(self, path):
+        """遍历目录（基于os.scandir，复用DirEntry缓存的元信息）"""
+        # 显式栈实现深度优先遍历：目录条目先产出，随后展开其内容
+        root = str(path)
+        prefix_len = len(root) + 1
+        stack = [root]
 
-            for item in self._walk_directory(self.module_path):
-                level = len(item["path"].relative_to(self.module_path).parts) - 1
-                indent = "  " * level
+        while stack:
+            current = stack.pop()
+            if isinstance(current, dict):
+                yield current
+                continue
 
-                if item["type"] == "dir":
-                    f.write(f"{indent}{item['name']}/\\n")
-                else:
-                    size_kb = item["size"] / 1024
-                    f.write(f"{indent}{item['name']} ({size_kb:.1f}KB)\\n")
+            try:
+                with os.scandir(current) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except PermissionError:
+                print(f"警告: 无权限访问 {current}")
+                continue
 
-    def _walk_directory(self, path, parent_path=None):
-        """遍历目录"""
-        items = []
+            # 逆序入栈，保证弹出顺序与排序一致
+            for entry in reversed(entries):
+                name = entry.name
 
-        try:
-            for item in sorted(path.iterdir()):
                 # 检查是否应该排除
-                if self._should_exclude(item):
+                if self._should_exclude(name):
                     continue
 
-                if item.is_dir():
-                    items.append({"type": "dir", "name": item.name, "path": item})
-                    # 递归处理子目录
-                    items.extend(self._walk_directory(item, path))
-                else:
-                    items.append(
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    stack.append(
+                        {
+                            "type": "dir",
+                            "name": name,
+                            "path": entry.path,
+                            "rel_path": entry.path[prefix_len:].replace(
+                                os.sep, "/"
+                            ),
+                        }
+                    )
+                elif entry.is_file(follow_symlinks=False):
+                    # 在遍历阶段就按扩展名过滤，被排除的文件不再创建任何对象
+                    dot = name.rfind(".")
+                    ext = name[dot:] if dot > 0 else ""
+                    if ext not in self._include_ext:
+                        continue
+
+                    stack.append(
                         {
                             "type": "file",
-                            "name": item.name,
-                            "path": item,
-                            "size": item.stat().st_size,
+                            "name": name,
+                            "path": entry.path,
+                            "rel_path": entry.path[prefix_len:].replace(
+                                os.sep, "/"
+                            ),
+                            "ext": ext,
+                            "size": entry.stat().st_size,
                         }
                     )
 
-        except PermissionError:
-            print(f"警告: 无权限访问 {path}")
-
-        return items
-
-    def _should_exclude(self, path):
-        """检查是否应该排除该路径"""
-        name = path.name
-
-        # 检查排除模式
-        for pattern in self.EXCLUDE_PATTERNS:
-            if pattern.startswith("*"):
-                if name.endswith(pattern[1:]):
-                    return True
-            elif name == pattern:
-                return True
+    def _collect_entries(self):
+        """遍历目录并缓存结果，避免重复遍历"""
+        if self._walk_cache is None:
+            self._walk_cache = list(self._walk_directory(self.module_path))
+        return self._walk_cache
 
-        # 检查文件扩展名
-        if path.is_file():
-            if path.suffix not in self.INCLUDE_EXTENSIONS:
-                return True
-
-        return False
+    def _should_exclude(self, name):
+        """检查名称是否命中排除模式"""
+        return name in self._exclude_exact or name.endswith(self._exclude_suffixes)
 
     def _extract_files(self):
         """提取文件内容"""
@@ -177,164 +278,222 @@ class OdooModuleExtractor:
 
         # 收集所有文件
         all_files = []
-        for item in self._walk_directory(self.module_path):
+        for item in self._collect_entries():
             if item["type"] == "file":
                 all_files.append(item)
 
-        # 按优先级排序
-        all_files.sort(key=lambda x: self._get_file_priority(x["path"]))
+        # 并行预读取（读文件和hashlib都会释放GIL）
+        self._prefetch_files(all_files)
+
+        # 预先计算优先级，排序走C级的itemgetter
+        for item in all_files:
+            item["priority"] = self._get_file_priority(item["rel_path"])
+        all_files.sort(key=itemgetter("priority"))
 
         # 写入内容
         with open(content_file, "w", encoding="utf-8") as f:
             f.write(f"# {self.module_name} 模块代码内容\\n")
-            f.write(f"# 生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\\n")
+            f.write(f"# 生成时间: {self._started_str}\\n")
             f.write(f"# 文件总数: {len(all_files)}\\n\\n")
 
             for file_item in all_files:
                 self._write_file_content(f, file_item)
 
-    def _get_file_priority(self, file_path):
-        """获取文件优先级"""
-        rel_path = file_path.relative_to(self.module_path)
-        rel_str = str(rel_path).replace("\\\\", "/")
-
-        # 检查精确匹配
-        for pattern, priority in self.PRIORITY_FILES.items():
-            if pattern == rel_str:
-                return priority
+    def _prefetch_files(self, file_items):
+        """并行读取所有文件内容和校验和"""
+        load = partial(_read_and_hash, stream_threshold=self._stream_threshold)
 
-        # 检查模式匹配
-        for pattern, priority in self.PRIORITY_FILES.items():
-            if "*" in pattern:
-                import fnmatch
+        if self.jobs > 1 and len(file_items) >= self.MIN_FILES_FOR_POOL:
+            # CPU较重的场景（大量哈希）用进程池摊到多核
+            with multiprocessing.Pool(self.jobs) as pool:
+                results = pool.map(load, file_items, chunksize=16)
+        else:
+            # I/O密集的常规场景用线程池（读文件和hashlib都释放GIL）
+            max_workers = min(32, (os.cpu_count() or 1) * 4)
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(load, file_items))
 
-                if fnmatch.fnmatch(rel_str, pattern):
-                    return priority
+        for item, result in zip(file_items, results):
+            self._file_data[item["path"]] = result
 
-        return 999  # 默认优先级
+    def _get_file_priority(self, rel_path):
+        """获取文件优先级"""
+        # 顶层文件按精确名称匹配
+        dir_part, _, _ = rel_path.rpartition("/")
+        if not dir_part:
+            return self._priority_exact.get(rel_path, 999)
+
+        # 其余文件按(目录前缀, 扩展名)匹配，从最长前缀逐级回退，
+        # 保持fnmatch中"*"可跨越"/"的匹配行为
+        ext = os.path.splitext(rel_path)[1]
+        parts = dir_part.split("/")
+        for depth in range(len(parts), 0, -1):
+            priority = self._priority_dir_ext.get(("/".join(parts[:depth]), ext))
+            if priority is not None:
+                return priority
+        return 999
 
     def _write_file_content(self, output_file, file_item):
         """写入单个文件内容"""
-        file_path = file_item["path"]
-        rel_path = file_path.relative_to(self.module_path)
+        rel_path = file_item["rel_path"]
+        ext = file_item["ext"]
+
+        # 文件头部信息一次性写出
+        output_file.write(
+            f"\\n{'=' * 80}\\n"
+            f"FILE: {rel_path}\\n"
+            f"SIZE: {file_item['size']} bytes\\n"
+            f"TYPE: {ext}\\n"
+        )
 
-        # 文件头部信息
-        output_file.write("\\n" + "=" * 80 + "\\n")
-        output_file.write(f"FILE: {rel_path}\\n")
-        output_file.write(f"SIZE: {file_item['size']} bytes\\n")
-        output_file.write(f"TYPE: {file_path.suffix}\\n")
+        # 使用预读取的数据，校验和与内容输出共用同一份数据
+        raw_bytes, checksum, error = self._file_data[file_item["path"]]
 
         # 特殊处理不同类型的文件
-        if file_path.suffix == ".py":
-            self._write_python_file(output_file, file_path)
-        elif file_path.suffix == ".xml":
-            self._write_xml_file(output_file, file_path)
+        if error is not None:
+            output_file.write(f"ERROR: 无法读取文件 - {error}\\n")
+        elif raw_bytes is None:
+            # 大文件：跳过解析，分块流式写出
+            if ext in (".py", ".xml"):
+                output_file.write("PARSED_INFO: [skipped - file too large]\\n")
+            self._stream_file_content(output_file, file_item["path"])
+        elif ext in (".py", ".xml") and file_item["size"] > self.parse_limit:
+            # 超过解析上限：只输出原始内容
+            output_file.write("PARSED_INFO: [skipped - file too large]\\nCONTENT:\\n")
+            output_file.write(raw_bytes.decode("utf-8", errors="replace"))
+        elif ext == ".py":
+            self._write_python_file(output_file, raw_bytes)
+        elif ext == ".xml":
+            self._write_xml_file(output_file, raw_bytes)
         else:
-            self._write_generic_file(output_file, file_path)
+            self._write_generic_file(output_file, raw_bytes)
 
         output_file.write("\\n" + "=" * 80 + "\\n")
 
         # 更新索引
         self.file_index.append(
             {
-                "path": str(rel_path),
+                "path": rel_path,
                 "size": file_item["size"],
-                "type": file_path.suffix,
-                "checksum": self._calculate_checksum(file_path),
+                "type": ext,
+                "checksum": checksum,
             }
         )
 
         self.total_size += file_item["size"]
+        self._type_counter[ext] += 1
 
-    def _write_python_file(self, output_file, file_path):
+    def _write_python_file(self, output_file, raw_bytes):
         """写入Python文件内容（带解析）"""
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
+        content = raw_bytes.decode("utf-8", errors="replace")
 
-            # 尝试解析Python文件
-            try:
-                tree = ast.parse(content)
-                classes = [
-                    node.name
-                    for node in ast.walk(tree)
-                    if isinstance(node, ast.ClassDef)
-                ]
-                functions = [
-                    node.name
-                    for node in ast.walk(tree)
-                    if isinstance(node, ast.FunctionDef)
-                ]
-
-                if classes or functions:
-                    output_file.write("PARSED_INFO:\\n")
-                    if classes:
-                        output_file.write(f"  Classes: {', '.join(classes)}\\n")
-                    if functions:
-                        output_file.write(
-                            f"  Functions: {', '.join(functions[:10])}{'...' if len(functions) > 10 else ''}\\n"
-                        )
-            except Exception:
-                pass
-
-            output_file.write("CONTENT:\\n")
-            output_file.write(content)
+        # 尝试解析Python文件
+        try:
+            tree = ast.parse(content)
+            # 广度优先遍历：单次遍历同时收集类和函数。
+            # 类名全部收集；函数名最多展示10个，多收集一个
+            # 用于判断是否需要省略号，之后不再追加
+            classes = []
+            functions = []
+            queue = deque(ast.iter_child_nodes(tree))
+            while queue:
+                node = queue.popleft()
+                node_type = type(node)
+                if node_type is ast.ClassDef:
+                    classes.append(node.name)
+                elif node_type is ast.FunctionDef and len(functions) < 11:
+                    functions.append(node.name)
+                queue.extend(ast.iter_child_nodes(node))
+
+            if classes or functions:
+                info = "PARSED_INFO:\\n"
+                if classes:
+                    info += f"  Classes: {', '.join(classes)}\\n"
+                if functions:
+                    info += f"  Functions: {', '.join(functions[:10])}{'...' if len(functions) > 10 else ''}\\n"
+                output_file.write(info)
+        except Exception:
+            pass
 
-        except Exception as e:
-            output_file.write(f"ERROR: 无法读取文件 - {e}\\n")
+        output_file.write("CONTENT:\\n")
+        output_file.write(content)
 
-    def _write_xml_file(self, output_file, file_path):
+    def _write_xml_file(self, output_file, raw_bytes):
         """写入XML文件内容（带解析）"""
+        content = raw_bytes.decode("utf-8", errors="replace")
+
+        # 尝试流式解析XML结构，避免构建完整DOM
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
+            root_tag = None
+            records_count = 0
+            templates_count = 0
+            record_ids = []
+
+            for _, elem in ET.iterparse(io.BytesIO(raw_bytes), events=("start",)):
+                if root_tag is None:
+                    root_tag = elem.tag
+                    # 非Odoo数据文件无需继续解析
+                    if root_tag != "odoo" and root_tag != "openerp":
+                        break
+                    continue
 
-            # 尝试解析XML结构
-            try:
-                root = ET.fromstring(content)
-                # 提取一些关键信息
-                if root.tag == "odoo" or root.tag == "openerp":
-                    records = root.findall(".//record")
-                    templates = root.findall(".//template")
-
-                    output_file.write("PARSED_INFO:\\n")
-                    if records:
-                        output_file.write(f"  Records: {len(records)}\\n")
-                        # 列出前5个record的id
-                        record_ids = [r.get("id", "no-id") for r in records[:5]]
-                        output_file.write(
-                            f"  Record IDs: {', '.join(record_ids)}{'...' if len(records) > 5 else ''}\\n"
-                        )
-                    if templates:
-                        output_file.write(f"  Templates: {len(templates)}\\n")
-            except Exception:
-                pass
-
-            output_file.write("CONTENT:\\n")
-            output_file.write(content)
+                if elem.tag == "record":
+                    records_count += 1
+                    # 只保留前5个record的id
+                    if len(record_ids) < 5:
+                        record_ids.append(elem.get("id", "no-id"))
+                elif elem.tag == "template":
+                    templates_count += 1
+                elem.clear()
+
+            if root_tag == "odoo" or root_tag == "openerp":
+                info = "PARSED_INFO:\\n"
+                if records_count:
+                    info += f"  Records: {records_count}\\n"
+                    info += f"  Record IDs: {', '.join(record_ids)}{'...' if records_count > 5 else ''}\\n"
+                if templates_count:
+                    info += f"  Templates: {templates_count}\\n"
+                output_file.write(info)
+        except Exception:
+            pass
+
+        output_file.write("CONTENT:\\n")
+        output_file.write(content)
 
+    def _stream_file_content(self, output_file, file_path):
+        """分块流式写入文件内容"""
+        try:
+            with open(file_path, "rb") as src:
+                # 先探测首块能否按UTF-8解码，确认是文本再写CONTENT头
+                decoder = codecs.getincrementaldecoder("utf-8")()
+                first_chunk = src.read(1 << 20)
+                try:
+                    text = decoder.decode(first_chunk)
+                except UnicodeDecodeError:
+                    # 可能是二进制文件
+                    output_file.write("CONTENT: [Binary file - skipped]\\n")
+                    return
+
+                output_file.write("CONTENT:\\n")
+                output_file.write(text)
+                for chunk in iter(lambda: src.read(1 << 20), b""):
+                    output_file.write(decoder.decode(chunk))
+                output_file.write(decoder.decode(b"", True))
         except Exception as e:
             output_file.write(f"ERROR: 无法读取文件 - {e}\\n")
 
-    def _write_generic_file(self, output_file, file_path):
+    def _write_generic_file(self, output_file, raw_bytes):
         """写入通用文件内容"""
         try:
-            # 尝试以文本方式读取
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-            output_file.write("CONTENT:\\n")
-            output_file.write(content)
-        except Exception:
+            # 尝试以文本方式解码
+            content = raw_bytes.decode("utf-8")
+        except UnicodeDecodeError:
             # 如果失败，可能是二进制文件
             output_file.write("CONTENT: [Binary file - skipped]\\n")
+            return
 
-    def _calculate_checksum(self, file_path):
-        """计算文件校验和"""
-        try:
-            with open(file_path, "rb") as f:
-                return hashlib.md5(f.read()).hexdigest()[:8]
-        except Exception:
-            return "error"
+        output_file.write("CONTENT:\\n")
+        output_file.write(content)
 
     def _generate_summary(self):
         """生成摘要信息"""
@@ -342,13 +501,13 @@ class OdooModuleExtractor:
 
         summary = {
             "module_name": self.module_name,
-            "extraction_date": datetime.now().isoformat(),
+            "extraction_date": self._started.isoformat(),
             "module_info": self.module_info,
             "statistics": {
                 "total_files": len(self.file_index),
                 "total_size_bytes": self.total_size,
                 "total_size_mb": round(self.total_size / 1024 / 1024, 2),
-                "file_types": self._count_file_types(),
+                "file_types": dict(self._type_counter),
             },
             "dependencies": self.module_info.get("depends", []),
             "version": self.module_info.get("version", "unknown"),
@@ -356,33 +515,29 @@ class OdooModuleExtractor:
             "category": self.module_info.get("category", "unknown"),
         }
 
-        with open(summary_file, "w", encoding="utf-8") as f:
-            json.dump(summary, f, ensure_ascii=False, indent=2)
+        self._dump_json(summary_file, summary)
 
-    def _count_file_types(self):
-        """统计文件类型"""
-        type_count = {}
-        for file in self.file_index:
-            ext = file["type"]
-            type_count[ext] = type_count.get(ext, 0) + 1
-        return type_count
+    def _dump_json(self, path, data):
+        """写出JSON文件（优先使用orjson加速序列化）"""
+        if orjson is not None:
+            path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
 
     def _create_index(self):
         """创建文件索引"""
         index_file = self.output_dir / f"{self.module_name}_index.json"
 
-        with open(index_file, "w", encoding="utf-8") as f:
-            json.dump(
-                {
-                    "module": self.module_name,
-                    "files": self.file_index,
-                    "total_files": len(self.file_index),
-                    "total_size": self.total_size,
-                },
-                f,
-                ensure_ascii=False,
-                indent=2,
-            )
+        self._dump_json(
+            index_file,
+            {
+                "module": self.module_name,
+                "files": self.file_index,
+                "total_files": len(self.file_index),
+                "total_size": self.total_size,
+            },
+        )
 
 
 def main():
@@ -390,6 +545,8 @@ def main():
     parser.add_argument("module_path", help="Odoo模块路径")
     parser.add_argument("-o", "--output", default="output", help="输出目录")
     parser.add_argument("--split-size", type=int, default=10, help="分割文件大小(MB)")
+    parser.add_argument("--parse-limit", type=int, default=256, help="解析文件大小上限(KB)")
+    parser.add_argument("--jobs", type=int, default=1, help="并行读取的进程数")
 
     args = parser.parse_args()
 
@@ -399,7 +556,12 @@ def main():
         sys.exit(1)
 
     # 执行提取
-    extractor = OdooModuleExtractor(args.module_path, args.output)
+    extractor = OdooModuleExtractor(
+        args.module_path,
+        args.output,
+        parse_limit=args.parse_limit * 1024,
+        jobs=args.jobs,
+    )
     extractor.extract()
 
 